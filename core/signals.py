@@ -1,32 +1,62 @@
 from django.dispatch import receiver
+from allauth.account.signals import user_logged_in
 from allauth.socialaccount.signals import social_account_added, social_account_updated
 
+# ключ сессии, где лежит отображаемое имя (считается один раз при входе)
+SESSION_FULL_NAME_KEY = "full_name"
+
+
+def full_name_from_extra_data(extra_data: dict) -> str:
+    """Имя из профиля Nextcloud: сначала userinfo, затем id_token."""
+    for section in ("userinfo", "id_token"):
+        try:
+            name = extra_data[section]["name"]
+        except (KeyError, TypeError):
+            continue
+        if name:
+            return name
+    return ""
+
+
 def _sync_full_name_from_extra_data(user, extra_data: dict):
     extra_data = extra_data or {}
 
     # В твоём Nextcloud "name" уже содержит "Фамилия Имя Отчество" корректно.
-    display = (extra_data.get("name") or "").strip()
-
-    if display:
-        parts = [p for p in display.split() if p]
-        # Сохраняем в стандартные поля Django максимально логично:
-        # first_name = Имя, last_name = "Фамилия Отчество"
-        if len(parts) >= 3:
-            family, given, middle = parts[0], parts[1], " ".join(parts[2:])
-            user.first_name = given
-            user.last_name = f"{family} {middle}".strip()
-        elif len(parts) == 2:
-            family, given = parts
-            user.first_name = given
-            user.last_name = family
-        else:
-            user.first_name = display
-        user.save(update_fields=["first_name", "last_name"])
-
-@receiver(social_account_added)
+    parts = (extra_data.get("name") or "").split()
+    if not parts:
+        return
+
+    # Сохраняем в стандартные поля Django максимально логично:
+    # first_name = Имя, last_name = "Фамилия Отчество"
+    if len(parts) >= 2:
+        family, given, *middle = parts
+        first_name, last_name = given, " ".join([family, *middle])
+    else:
+        first_name, last_name = parts[0], user.last_name
+
+    # при повторных входах имя обычно не меняется – тогда UPDATE не нужен
+    if user.first_name == first_name and user.last_name == last_name:
+        return
+
+    user.first_name = first_name
+    user.last_name = last_name
+    user.save(update_fields=["first_name", "last_name"])
+
+
+@receiver(social_account_added, dispatch_uid="core.sync_full_name_on_added")
 def on_social_account_added(request, sociallogin, **kwargs):
     _sync_full_name_from_extra_data(sociallogin.user, sociallogin.account.extra_data)
 
-@receiver(social_account_updated)
+
+@receiver(social_account_updated, dispatch_uid="core.sync_full_name_on_updated")
 def on_social_account_updated(request, sociallogin, **kwargs):
     _sync_full_name_from_extra_data(sociallogin.user, sociallogin.account.extra_data)
+
+
+@receiver(user_logged_in, dispatch_uid="core.session_full_name_on_login")
+def on_user_logged_in(request, user, sociallogin=None, **kwargs):
+    if sociallogin is None or request is None:
+        return
+    full_name = full_name_from_extra_data(sociallogin.account.extra_data)
+    if full_name:
+        request.session[SESSION_FULL_NAME_KEY] = full_name
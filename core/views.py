@@ -3,6 +3,10 @@ from django.contrib.auth.decorators import login_required
 from django.shortcuts import redirect, render
 from datetime import datetime
 
+from allauth.socialaccount.models import SocialAccount
+
+from .signals import SESSION_FULL_NAME_KEY, full_name_from_extra_data
+
 
 def home(request):
     if request.user.is_authenticated:
@@ -10,29 +14,32 @@ def home(request):
     return render(request, "login.html")
 
 
+def _greeting_for_hour(hour: int):
+    if 5 <= hour < 12:
+        return "Доброе утро", "morning"
+    if 12 <= hour < 18:
+        return "Добрый день", "day"
+    return "Добрый вечер", "evening"
+
+
+# (greeting, greeting_time) для каждого часа суток – считаем один раз при импорте
+_GREETING_BY_HOUR = tuple(_greeting_for_hour(hour) for hour in range(24))
+
 
 @login_required
 def me(request):
-    sa = request.user.socialaccount_set.first()
+    # одним запросом и только нужную колонку; extra_data отдаём и в шаблон (аватарка)
+    sa = SocialAccount.objects.filter(user=request.user).only("extra_data").first()
     extra = sa.extra_data if sa else {}
 
+    # имя кладётся в сессию при входе; разбор extra_data – только для старых сессий
     full_name = (
-        extra.get("userinfo", {}).get("name")
-        or extra.get("id_token", {}).get("name")
+        request.session.get(SESSION_FULL_NAME_KEY)
+        or full_name_from_extra_data(extra)
         or request.user.get_username()
     )
 
-    hour = datetime.now().hour
-
-    if 5 <= hour < 12:
-        greeting = "Доброе утро"
-        greeting_time = "morning"
-    elif 12 <= hour < 18:
-        greeting = "Добрый день"
-        greeting_time = "day"
-    else:
-        greeting = "Добрый вечер"
-        greeting_time = "evening"
+    greeting, greeting_time = _GREETING_BY_HOUR[datetime.now().hour]
 
     return render(
         request,
@@ -41,6 +48,7 @@ def me(request):
             "greeting": greeting,
             "greeting_time": greeting_time,
             "full_name": full_name,
+            "extra": extra,
         },
     )
 
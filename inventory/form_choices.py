@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+from django import forms
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+
+from .models import Building, CartridgeModel, PrinterModel
+
+
+# Справочники маленькие и меняются редко, а формы строят их на каждый запрос.
+# Кэшируем готовые (pk, label) и сбрасываем по сигналам (inventory/signals.py).
+# Кэш – LocMem, свой у каждого процесса gunicorn: сигнал очищает его только в том
+# процессе, где сохранили запись, а остальные до CHOICES_TTL секунд показывают
+# старый список (без нового корпуса/модели). Поэтому уже выбранные pk (require)
+# проверяются по списку: если такого нет – список перечитывается из БД.
+CHOICES_TTL = 60
+
+BUILDING_CHOICES_KEY = "inventory:choices:buildings"
+PRINTER_MODEL_CHOICES_KEY = "inventory:choices:printer_models"
+CARTRIDGE_CHOICES_KEY = "inventory:choices:cartridges"
+
+
+def _int_pk(value):
+    try:
+        pk = int(value)
+    except (TypeError, ValueError):
+        return None
+    return pk if pk > 0 else None
+
+
+def _has_pks(choices, pks) -> bool:
+    # мусор из URL (?building=abc) в списке заведомо не появится – перечитывать ради него незачем
+    known = {pk for pk, _ in choices}
+    return all(pk in known for pk in map(_int_pk, pks) if pk is not None)
+
+
+def _cached_choices(key, load, require=()) -> list[tuple[int, str]]:
+    cached = cache.get(key)
+    if cached is not None and _has_pks(cached, require):
+        return cached
+    choices = load()
+    # несуществующий pk не меняет список – не перезаписываем кэш зря
+    if choices != cached:
+        cache.set(key, choices, CHOICES_TTL)
+    return choices
+
+
+def selected_pks(form, name) -> list:
+    """pk, уже выбранные в поле формы: из отправленных данных, у несвязанной формы – из initial."""
+    if form.is_bound:
+        key = form.add_prefix(name)
+        return form.data.getlist(key) if hasattr(form.data, "getlist") else [form.data.get(key)]
+    value = form.initial.get(name)
+    values = value if isinstance(value, (list, tuple)) else [value]
+    # initial для M2M (model_to_dict) – объекты, а не pk
+    return [getattr(v, "pk", v) for v in values]
+
+
+def building_choices(require=()) -> list[tuple[int, str]]:
+    return _cached_choices(
+        BUILDING_CHOICES_KEY,
+        lambda: list(Building.objects.order_by("name").values_list("id", "name")),
+        require,
+    )
+
+
+def cached_buildings(require=()) -> list[dict]:
+    """Корпуса по имени в виде {"id", "name"} – для фильтров и ссылок в шаблонах, из того же кэша."""
+    return [{"id": pk, "name": name} for pk, name in building_choices(require)]
+
+
+def printer_model_choices(require=()) -> list[tuple[int, str]]:
+    return _cached_choices(
+        PRINTER_MODEL_CHOICES_KEY,
+        lambda: [
+            (pk, f"{vendor} {model}")
+            for pk, vendor, model in PrinterModel.objects.order_by("vendor", "model").values_list("id", "vendor", "model")
+        ],
+        require,
+    )
+
+
+def cartridge_choices(require=()) -> list[tuple[int, str]]:
+    return _cached_choices(
+        CARTRIDGE_CHOICES_KEY,
+        lambda: [
+            (pk, f"{vendor} {code}")
+            for pk, vendor, code in CartridgeModel.objects.order_by("vendor", "code").values_list("id", "vendor", "code")
+        ],
+        require,
+    )
+
+
+def cartridges_for_printer(printer_id) -> list[tuple[int, str, str]]:
+    """(id, vendor, code) картриджей, совместимых с моделью принтера, – одним запросом, без моделей."""
+    return list(
+        CartridgeModel.objects
+        .filter(compatible_printers__printers=printer_id)
+        .order_by("vendor", "code")
+        .values_list("id", "vendor", "code")
+    )
+
+
+def use_cached_choices(field, choices):
+    """
+    Подставляет готовые choices в ModelChoiceField/ModelMultipleChoiceField:
+    виджет рендерится без SQL, а queryset поля по-прежнему используется для валидации.
+    """
+    empty = [("", field.empty_label)] if getattr(field, "empty_label", None) is not None else []
+    field.choices = empty + list(choices)
+
+
+class PreloadedModelChoiceField(forms.ModelChoiceField):
+    """
+    ModelChoiceField для маленьких зависимых списков (кабинеты корпуса, принтеры кабинета):
+    после preload() и рендер, и валидация работают по уже загруженным объектам, без SQL.
+    """
+
+    def preload(self, objects):
+        self._preloaded = {str(obj.pk): obj for obj in objects}
+        use_cached_choices(self, [(obj.pk, self.label_from_instance(obj)) for obj in objects])
+
+    def preloaded(self, value):
+        """Уже загруженный объект по pk (None – если списка нет или такого pk в нём нет)."""
+        return getattr(self, "_preloaded", {}).get(str(value))
+
+    def to_python(self, value):
+        preloaded = getattr(self, "_preloaded", None)
+        if preloaded is None or value in self.empty_values:
+            return super().to_python(value)
+
+        obj = preloaded.get(str(value))
+        if obj is None:
+            raise ValidationError(
+                self.error_messages["invalid_choice"],
+                code="invalid_choice",
+                params={"value": value},
+            )
+        return obj
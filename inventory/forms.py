@@ -1,13 +1,25 @@
 from django import forms
-from django.db import connection
-from django.db.models import IntegerField, Value
-from django.db.models.functions import Cast, Coalesce, NullIf
-from django.db.models import Func
 
 from .models import (
     Building, Room, Printer, PrinterModel, CartridgeModel,
     StockTransaction, GlobalStock
 )
+from .form_choices import (
+    PreloadedModelChoiceField, building_choices, cartridge_choices, cartridges_for_printer,
+    printer_model_choices, selected_pks, use_cached_choices
+)
+
+
+# Общие attrs виджетов: Widget.__init__ всё равно копирует словарь, поэтому
+# один экземпляр можно безопасно переиспользовать во всех формах модуля
+TEXT_ATTRS = {"class": "form-control"}
+SELECT_ATTRS = {"class": "form-select"}
+REQUIRED_SELECT_ATTRS = {"class": "form-select", "required": True}
+MULTISELECT_ATTRS = {"class": "form-select", "size": "10"}
+CHECKBOX_ATTRS = {"class": "form-check-input"}
+QTY_ATTRS = {"class": "form-control", "min": 1}
+TEXTAREA2_ATTRS = {"class": "form-control", "rows": 2}
+TEXTAREA3_ATTRS = {"class": "form-control", "rows": 3}
 
 
 # -------------------------
@@ -15,27 +27,8 @@ from .models import (
 # -------------------------
 
 def order_rooms_queryset(qs):
-    qs = qs.select_related("building")
-
-    if connection.vendor == "postgresql":
-        digits_only = Func(
-            "number",
-            Value(r"[^0-9]"),
-            Value(""),
-            Value("g"),
-            function="regexp_replace",
-        )
-
-        qs = qs.annotate(
-            number_int=Coalesce(
-                Cast(NullIf(digits_only, Value("")), IntegerField()),
-                Value(0),
-            )
-        ).order_by("building__name", "number_int", "number")
-
-        return qs
-
-    return qs.order_by("building__name", "number")
+    # number_int хранится в Room (заполняется при сохранении) и покрыт индексом
+    return qs.select_related("building").order_by("building__name", "number_int", "number")
 
 
 # -------------------------
@@ -51,8 +44,8 @@ class BuildingForm(forms.ModelForm):
             "address": "Адрес",
         }
         widgets = {
-            "name": forms.TextInput(attrs={"class": "form-control"}),
-            "address": forms.TextInput(attrs={"class": "form-control"}),
+            "name": forms.TextInput(attrs=TEXT_ATTRS),
+            "address": forms.TextInput(attrs=TEXT_ATTRS),
         }
 
 
@@ -67,15 +60,16 @@ class RoomForm(forms.ModelForm):
             "owner_email": "Электронная почта",
         }
         widgets = {
-            "building": forms.Select(attrs={"class": "form-select"}),
-            "number": forms.TextInput(attrs={"class": "form-control"}),
-            "owner_name": forms.TextInput(attrs={"class": "form-control"}),
-            "owner_email": forms.EmailInput(attrs={"class": "form-control"}),
+            "building": forms.Select(attrs=SELECT_ATTRS),
+            "number": forms.TextInput(attrs=TEXT_ATTRS),
+            "owner_name": forms.TextInput(attrs=TEXT_ATTRS),
+            "owner_email": forms.EmailInput(attrs=TEXT_ATTRS),
         }
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.fields["building"].queryset = Building.objects.order_by("name")
+        use_cached_choices(self.fields["building"], building_choices(selected_pks(self, "building")))
 
 
 class PrinterModelForm(forms.ModelForm):
@@ -87,8 +81,8 @@ class PrinterModelForm(forms.ModelForm):
             "model": "Модель принтера",
         }
         widgets = {
-            "vendor": forms.TextInput(attrs={"class": "form-control"}),
-            "model": forms.TextInput(attrs={"class": "form-control"}),
+            "vendor": forms.TextInput(attrs=TEXT_ATTRS),
+            "model": forms.TextInput(attrs=TEXT_ATTRS),
         }
 
 
@@ -103,17 +97,18 @@ class CartridgeModelForm(forms.ModelForm):
             "compatible_printers": "Совместимые модели принтеров",
         }
         widgets = {
-            "vendor": forms.TextInput(attrs={"class": "form-control"}),
-            "code": forms.TextInput(attrs={"class": "form-control"}),
-            "title": forms.TextInput(attrs={"class": "form-control"}),
-            "compatible_printers": forms.SelectMultiple(
-                attrs={"class": "form-select", "size": "10"}
-            ),
+            "vendor": forms.TextInput(attrs=TEXT_ATTRS),
+            "code": forms.TextInput(attrs=TEXT_ATTRS),
+            "title": forms.TextInput(attrs=TEXT_ATTRS),
+            "compatible_printers": forms.SelectMultiple(attrs=MULTISELECT_ATTRS),
         }
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.fields["compatible_printers"].queryset = PrinterModel.objects.order_by("vendor", "model")
+        use_cached_choices(
+            self.fields["compatible_printers"], printer_model_choices(selected_pks(self, "compatible_printers"))
+        )
 
 
 class PrinterForm(forms.ModelForm):
@@ -127,10 +122,10 @@ class PrinterForm(forms.ModelForm):
             "note": "Примечание",
         }
         widgets = {
-            "room": forms.Select(attrs={"class": "form-select"}),
-            "printer_model": forms.Select(attrs={"class": "form-select"}),
-            "inventory_tag": forms.TextInput(attrs={"class": "form-control"}),
-            "note": forms.Textarea(attrs={"class": "form-control", "rows": 3}),
+            "room": forms.Select(attrs=SELECT_ATTRS),
+            "printer_model": forms.Select(attrs=SELECT_ATTRS),
+            "inventory_tag": forms.TextInput(attrs=TEXT_ATTRS),
+            "note": forms.Textarea(attrs=TEXTAREA3_ATTRS),
         }
 
     def __init__(self, *args, **kwargs):
@@ -143,6 +138,7 @@ class PrinterForm(forms.ModelForm):
 
         self.fields["room"].queryset = order_rooms_queryset(rooms_qs)
         self.fields["printer_model"].queryset = PrinterModel.objects.order_by("vendor", "model")
+        use_cached_choices(self.fields["printer_model"], printer_model_choices(selected_pks(self, "printer_model")))
 
         # Если редактируем и building_id не передан – оставляем всё как есть
         # Если building_id передан – удобно проставить initial
@@ -166,11 +162,11 @@ class StockInForm(forms.ModelForm):
             "comment": "Комментарий",
         }
         widgets = {
-            "cartridge": forms.Select(attrs={"class": "form-select"}),
-            "qty": forms.NumberInput(attrs={"class": "form-control", "min": 1}),
-            "building": forms.Select(attrs={"class": "form-select", "required": True}),
-            "on_balance": forms.CheckboxInput(attrs={"class": "form-check-input"}),
-            "comment": forms.Textarea(attrs={"class": "form-control", "rows": 2}),
+            "cartridge": forms.Select(attrs=SELECT_ATTRS),
+            "qty": forms.NumberInput(attrs=QTY_ATTRS),
+            "building": forms.Select(attrs=REQUIRED_SELECT_ATTRS),
+            "on_balance": forms.CheckboxInput(attrs=CHECKBOX_ATTRS),
+            "comment": forms.Textarea(attrs=TEXTAREA2_ATTRS),
         }
 
     def __init__(self, *args, **kwargs):
@@ -184,6 +180,8 @@ class StockInForm(forms.ModelForm):
         self.fields["building"].error_messages = {
             "required": "Выберите корпус, в который поступили картриджи."
         }
+        use_cached_choices(self.fields["cartridge"], cartridge_choices(selected_pks(self, "cartridge")))
+        use_cached_choices(self.fields["building"], building_choices(selected_pks(self, "building")))
 
 
 class StockOutForm(forms.ModelForm):
@@ -191,42 +189,47 @@ class StockOutForm(forms.ModelForm):
         queryset=Building.objects.none(),
         required=True,
         label="Корпус",
-        widget=forms.Select(attrs={"class": "form-select"}),
+        widget=forms.Select(attrs=SELECT_ATTRS),
     )
 
-    room = forms.ModelChoiceField(
+    room = PreloadedModelChoiceField(
         queryset=Room.objects.none(),
         required=True,
         label="Кабинет",
-        widget=forms.Select(attrs={"class": "form-select"}),
+        widget=forms.Select(attrs=SELECT_ATTRS),
+    )
+
+    printer = PreloadedModelChoiceField(
+        queryset=Printer.objects.none(),
+        required=False,
+        label="Принтер",
+        widget=forms.Select(attrs=SELECT_ATTRS),
     )
 
     source_building = forms.ModelChoiceField(
         queryset=Building.objects.none(),
         required=False,
         label="Выдать со склада (корпуса)",
-        widget=forms.Select(attrs={"class": "form-select"}),
+        widget=forms.Select(attrs=SELECT_ATTRS),
     )
 
     cartridge_variant = forms.ChoiceField(
         required=True,
         label="Картридж",
         choices=[],
-        widget=forms.Select(attrs={"class": "form-select"}),
+        widget=forms.Select(attrs=SELECT_ATTRS),
     )
 
     class Meta:
         model = StockTransaction
         fields = ["building", "room", "printer", "qty", "comment"]
         labels = {
-            "printer": "Принтер",
             "qty": "Количество",
             "comment": "Комментарий",
         }
         widgets = {
-            "printer": forms.Select(attrs={"class": "form-select"}),
-            "qty": forms.NumberInput(attrs={"class": "form-control", "min": 1}),
-            "comment": forms.Textarea(attrs={"class": "form-control", "rows": 2}),
+            "qty": forms.NumberInput(attrs=QTY_ATTRS),
+            "comment": forms.Textarea(attrs=TEXTAREA2_ATTRS),
         }
 
     def __init__(self, *args, **kwargs):
@@ -240,69 +243,83 @@ class StockOutForm(forms.ModelForm):
         super().__init__(*args, **kwargs)
 
         self.fields["building"].queryset = Building.objects.order_by("name")
+        use_cached_choices(
+            self.fields["building"], building_choices([building_id, *selected_pks(self, "building")])
+        )
 
-        # source_building по умолчанию пустой (а если view передал ids — ограничим)
-        if source_building_ids is not None:
-            self.fields["source_building"].queryset = Building.objects.filter(id__in=source_building_ids).order_by("name")
-        else:
-            self.fields["source_building"].queryset = Building.objects.order_by("name")
+        # source_building по умолчанию – все корпуса (а если view передал ids — ограничим)
+        self.limit_source_buildings(source_building_ids)
 
         self.fields["printer"].queryset = Printer.objects.none()
         self.fields["room"].queryset = Room.objects.none()
         self.fields["cartridge_variant"].choices = [("", "— выберите картридж —")]
 
+        # кабинеты и принтеры загружаем один раз – этим же списком форма и рендерится, и валидируется
         if building_id:
             rooms_qs = order_rooms_queryset(Room.objects.filter(building_id=building_id))
             self.fields["room"].queryset = rooms_qs
+            self.fields["room"].preload(list(rooms_qs))
             self.initial["building"] = building_id
 
+        # принтеры кабинета считываем один раз: ими же пользуется view (printers_in_room)
+        self.printers_in_room = []
         if room_id:
-            self.fields["printer"].queryset = (
+            printers_qs = (
                 Printer.objects.select_related("printer_model", "room", "room__building")
                 .filter(room_id=room_id)
                 .order_by("printer_model__vendor", "printer_model__model", "inventory_tag")
             )
+            self.fields["printer"].queryset = printers_qs
+            self.printers_in_room = list(printers_qs)
+            self.fields["printer"].preload(self.printers_in_room)
             self.initial["room"] = room_id
 
         if printer_id:
-            try:
-                printer = Printer.objects.select_related("printer_model").get(pk=printer_id)
-
-                base_qs = (
-                    CartridgeModel.objects
-                    .filter(compatible_printers=printer.printer_model)
-                    .order_by("vendor", "code")
-                )
-
-                # Остатки по школе для формирования вариантов
-                gs_map = {
-                    f"{s.cartridge_id}:{1 if s.on_balance else 0}": s.qty
-                    for s in GlobalStock.objects.all()
-                }
-
-                choices = [("", "— выберите картридж —")]
-                for c in base_qs:
-                    on_qty = gs_map.get(f"{c.id}:1", 0)
-                    off_qty = gs_map.get(f"{c.id}:0", 0)
-
-                    # показываем оба варианта, если они в принципе встречались или есть остаток
-                    # (если хочешь строго “как раньше”: показывать вариант с пометкой “(на балансе)” только при наличии)
-                    if off_qty > 0 or on_qty == 0:
-                        choices.append((f"{c.id}:0", f"{c.vendor} {c.code}"))
-                    if on_qty > 0:
-                        choices.append((f"{c.id}:1", f"{c.vendor} {c.code} (на балансе)"))
-
-                    # если вообще всё 0, оставим хотя бы один вариант "не на балансе"
-                    if on_qty == 0 and off_qty == 0:
-                        # гарантируем, что "не на балансе" есть
-                        if (f"{c.id}:0", f"{c.vendor} {c.code}") not in choices:
-                            choices.append((f"{c.id}:0", f"{c.vendor} {c.code}"))
-
-                self.fields["cartridge_variant"].choices = choices
-                self.initial["printer"] = printer_id
-
-            except Printer.DoesNotExist:
-                pass
+            # модель принтера подтягивается join-ом в том же запросе, что и картриджи
+            cartridges = cartridges_for_printer(printer_id)
+
+            # Остатки по школе для формирования вариантов – только по совместимым картриджам
+            gs_map = {
+                (cartridge_id, on_balance): qty
+                for cartridge_id, on_balance, qty in GlobalStock.objects.filter(
+                    cartridge_id__in=[c_id for c_id, _, _ in cartridges]
+                ).values_list("cartridge_id", "on_balance", "qty")
+            }
+
+            choices = [("", "— выберите картридж —")]
+            for c_id, vendor, code in cartridges:
+                on_qty = gs_map.get((c_id, True), 0)
+                off_qty = gs_map.get((c_id, False), 0)
+
+                # показываем оба варианта, если они в принципе встречались или есть остаток
+                # (если хочешь строго “как раньше”: показывать вариант с пометкой “(на балансе)” только при наличии)
+                # если вообще всё 0, первое условие оставит хотя бы вариант "не на балансе" –
+                # отдельная проверка с поиском по списку не нужна
+                label = f"{vendor} {code}"
+                if off_qty > 0 or on_qty == 0:
+                    choices.append((f"{c_id}:0", label))
+                if on_qty > 0:
+                    choices.append((f"{c_id}:1", f"{label} (на балансе)"))
+
+            self.fields["cartridge_variant"].choices = choices
+            self.initial["printer"] = printer_id
+
+    def limit_source_buildings(self, building_ids=None):
+        """
+        Ограничивает source_building корпусами building_ids (None – все корпуса).
+        Список для рендера берётся из того же кэша, что и у поля building.
+        """
+        field = self.fields["source_building"]
+        qs = Building.objects.order_by("name")
+        # корпуса с остатками обязательны в списке: созданный в другом процессе корпус
+        # может ещё отсутствовать в кэше справочника, хотя в боковой панели он уже есть
+        choices = building_choices([*selected_pks(self, "source_building"), *(building_ids or [])])
+        if building_ids is not None:
+            ids = set(building_ids)
+            qs = qs.filter(id__in=ids)
+            choices = [(pk, name) for pk, name in choices if pk in ids]
+        field.queryset = qs
+        use_cached_choices(field, choices)
 
     def clean_cartridge_variant(self):
         val = (self.cleaned_data.get("cartridge_variant") or "").strip()
@@ -311,18 +328,17 @@ class StockOutForm(forms.ModelForm):
         c_id, flag = val.split(":", 1)
         if not c_id.isdigit() or flag not in ("0", "1"):
             raise forms.ValidationError("Некорректный тип картриджа.")
+        # разобранное значение нужно clean() – второй раз строку не парсим
+        self._variant = (int(c_id), flag == "1")
         return val
 
     def clean(self):
         cleaned = super().clean()
 
         # Проставить instance.cartridge и instance.on_balance
-        variant = cleaned.get("cartridge_variant")
-        if variant and ":" in variant:
-            c_id, flag = variant.split(":", 1)
-            try:
-                self.instance.cartridge = CartridgeModel.objects.get(pk=int(c_id))
-                self.instance.on_balance = (flag == "1")
-            except (CartridgeModel.DoesNotExist, ValueError):
-                self.add_error("cartridge_variant", "Выбранный картридж не найден.")
+        # id уже проверен: вариант есть в choices, собранных из совместимых картриджей,
+        # поэтому сам картридж не загружаем – хватает FK id
+        variant = getattr(self, "_variant", None)
+        if variant and "cartridge_variant" in cleaned:
+            self.instance.cartridge_id, self.instance.on_balance = variant
         return cleaned
\ No newline at end of file
@@ -1,7 +1,14 @@
 from django.core.management.base import BaseCommand
 from django.db import transaction, models
+from django.db.models import F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Concat, Trim
 
-from inventory.models import StockTransaction
+from inventory.models import Building, Printer, StockTransaction
+
+
+def _printer_value(expr):
+    """Подзапрос к принтеру транзакции (UPDATE не допускает join-ов в F())."""
+    return Subquery(Printer.objects.filter(pk=OuterRef("printer_id")).values(v=expr)[:1])
 
 
 class Command(BaseCommand):
@@ -24,20 +31,8 @@ class Command(BaseCommand):
         dry_run = bool(options["dry_run"])
         limit = int(options["limit"] or 0)
 
-        qs = (
-            StockTransaction.objects
-            .select_related(
-                "building",
-                "printer",
-                "printer__printer_model",
-                "printer__room",
-                "printer__room__building",
-            )
-            .order_by("id")
-        )
-
         # обновляем только те, где есть пустые snapshot-поля
-        qs = qs.filter(
+        qs = StockTransaction.objects.filter(
             # хотя бы одно из важного пустое
             # (для IN достаточно building_snapshot, для OUT – несколько полей)
             # делаем шире, чтобы дозаполнить всё аккуратно
@@ -48,81 +43,58 @@ class Command(BaseCommand):
         )
 
         if limit > 0:
-            qs = qs[:limit]
-
-        updated = 0
-        checked = 0
+            # фиксируем набор заранее: после первых UPDATE фильтр выше выбрал бы другие строки
+            ids = list(qs.order_by("id").values_list("id", flat=True)[:limit])
+            qs = StockTransaction.objects.filter(pk__in=ids)
+
+        IN, OUT = StockTransaction.Type.IN, StockTransaction.Type.OUT
+        building_name = Subquery(Building.objects.filter(pk=OuterRef("building_id")).values("name")[:1])
+        out_with_printer = Q(tx_type=OUT, printer__isnull=False)
+
+        # (условие, поле, значение) – по одному UPDATE на каждое правило вместо save() на каждую строку
+        rules = [
+            # инв. номер первым: это поле не входит в фильтр qs, а остальные правила его сужают
+            (out_with_printer & Q(printer_inventory_tag_snapshot=""),
+             "printer_inventory_tag_snapshot", Coalesce(_printer_value(F("inventory_tag")), Value(""))),
+
+            # IN: корпус обычно в tx.building
+            (Q(tx_type=IN, building_snapshot="", building__isnull=False),
+             "building_snapshot", building_name),
+            # OUT: приоритет — корпус из printer.room.building
+            (Q(tx_type=OUT, building_snapshot="") & (Q(printer__isnull=False) | Q(building__isnull=False)),
+             "building_snapshot", Coalesce(_printer_value(F("room__building__name")), building_name)),
+
+            # кабинет
+            (out_with_printer & Q(room_snapshot=""),
+             "room_snapshot", Coalesce(_printer_value(F("room__number")), Value(""))),
+
+            # модель принтера
+            (out_with_printer & Q(printer_model_snapshot=""),
+             "printer_model_snapshot",
+             _printer_value(Trim(Concat("printer_model__vendor", Value(" "), "printer_model__model")))),
+
+            # кому выдали: issued_to, иначе ответственный за кабинет
+            (Q(tx_type=OUT, issued_to_snapshot="") & ~Q(issued_to=""),
+             "issued_to_snapshot", F("issued_to")),
+            (out_with_printer & Q(issued_to_snapshot="", issued_to="") & ~Q(printer__room__owner_name=""),
+             "issued_to_snapshot", _printer_value(F("room__owner_name"))),
+        ]
+
+        # IN: issued_to/printer/room обычно не нужны, оставим как есть
 
         self.stdout.write(self.style.NOTICE("Backfill snapshot-полей..."))
 
-        try:
+        checked = qs.count()
+        changed = Q()
+        for cond, _, _ in rules:
+            changed |= cond
+        updated = qs.filter(changed).count()
+
+        if not dry_run:
             with transaction.atomic():
-                for tx in qs:
-                    checked += 1
-                    changed = False
-
-                    # IN: корпус обычно в tx.building
-                    if not tx.building_snapshot:
-                        if tx.tx_type == StockTransaction.Type.IN:
-                            if tx.building:
-                                tx.building_snapshot = tx.building.name
-                                changed = True
-                        else:
-                            # OUT: приоритет — корпус из printer.room.building
-                            if tx.printer and tx.printer.room and tx.printer.room.building:
-                                tx.building_snapshot = tx.printer.room.building.name
-                                changed = True
-                            elif tx.building:
-                                tx.building_snapshot = tx.building.name
-                                changed = True
-
-                    if tx.tx_type == StockTransaction.Type.OUT:
-                        # кабинет
-                        if not tx.room_snapshot and tx.printer and tx.printer.room:
-                            tx.room_snapshot = tx.printer.room.number or ""
-                            changed = True
-
-                        # модель принтера
-                        if not tx.printer_model_snapshot and tx.printer and tx.printer.printer_model:
-                            pm = tx.printer.printer_model
-                            tx.printer_model_snapshot = f"{pm.vendor} {pm.model}".strip()
-                            changed = True
-
-                        # инв. номер
-                        if not tx.printer_inventory_tag_snapshot and tx.printer:
-                            tx.printer_inventory_tag_snapshot = tx.printer.inventory_tag or ""
-                            changed = True
-
-                        # кому выдали (у тебя уже есть issued_to – можно зафиксировать его)
-                        if not tx.issued_to_snapshot:
-                            if tx.issued_to:
-                                tx.issued_to_snapshot = tx.issued_to
-                                changed = True
-                            elif tx.printer and tx.printer.room and tx.printer.room.owner_name:
-                                tx.issued_to_snapshot = tx.printer.room.owner_name
-                                changed = True
-
-                    # IN: issued_to/printer/room обычно не нужны, оставим как есть
-
-                    if changed:
-                        updated += 1
-                        if not dry_run:
-                            tx.save(update_fields=[
-                                "building_snapshot",
-                                "room_snapshot",
-                                "printer_model_snapshot",
-                                "printer_inventory_tag_snapshot",
-                                "issued_to_snapshot",
-                            ])
-
-                if dry_run:
-                    # откатываем транзакцию, чтобы ничего не записалось
-                    raise RuntimeError("DRY_RUN_ROLLBACK")
-
-        except RuntimeError as e:
-            if str(e) != "DRY_RUN_ROLLBACK":
-                raise
+                for cond, field, value in rules:
+                    qs.filter(cond).update(**{field: value})
 
         self.stdout.write(self.style.SUCCESS(
             f"Проверено: {checked}. Будет обновлено: {updated}. {'(dry-run)' if dry_run else ''}"
-        ))
\ No newline at end of file
+        ))
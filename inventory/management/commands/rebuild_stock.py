@@ -2,25 +2,127 @@ from __future__ import annotations
 
 from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, Sum, When, Window
 
 from inventory.models import BuildingStock, GlobalStock, StockTransaction
 from inventory.services import apply_transaction
 
 
+# приход – плюс, выдача – минус
+SIGNED = Case(
+    When(tx_type=StockTransaction.Type.IN, then=F("qty")),
+    default=-F("qty"),
+    output_field=IntegerField(),
+)
+SIGNED_QTY = Sum(SIGNED)
+
+
 class Command(BaseCommand):
     help = "Пересобирает GlobalStock и BuildingStock по журналу StockTransaction."
 
-    def handle(self, *args, **options):
-        qs = StockTransaction.objects.select_related("cartridge", "building").order_by("created_at", "id")
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--legacy",
+            action="store_true",
+            help=(
+                "Проводить транзакции по одной через apply_transaction "
+                "(медленно; результат и отказы те же, что по умолчанию, – для сверки)"
+            ),
+        )
 
+    def handle(self, *args, **options):
         with transaction.atomic():
             BuildingStock.objects.all().delete()
             GlobalStock.objects.all().delete()
 
-            for tx in qs:
-                try:
-                    apply_transaction(tx)
-                except Exception as e:
-                    raise CommandError(f"Ошибка на транзакции id={tx.id}: {e}") from e
+            if options["legacy"]:
+                self._rebuild_by_transactions()
+            else:
+                self._rebuild_by_aggregation()
+
+        self.stdout.write(self.style.SUCCESS("Остатки успешно пересобраны."))
+
+    def _rebuild_by_transactions(self):
+        # apply_transaction читает только id-шники, qty и флаги – связанные модели не нужны
+        qs = (
+            StockTransaction.objects
+            .only("id", "tx_type", "qty", "on_balance", "cartridge_id", "building_id")
+            .order_by("created_at", "id")
+        )
+
+        for tx in qs.iterator(chunk_size=2000):
+            try:
+                apply_transaction(tx)
+            except Exception as e:
+                raise CommandError(f"Ошибка на транзакции id={tx.id}: {e}") from e
+
+    def _rebuild_by_aggregation(self):
+        """
+        Итог журнала – сумма qty со знаком по ключу (GROUP BY) и два bulk_create.
+        Уход остатка в минус по ходу журнала ловит оконная сумма в порядке (created_at, id).
+        """
+        # ошибки собираем все сразу, а не до первой: ничего не записано, пока журнал не чистый
+        errors = []
+
+        # те же проверки, что делает apply_transaction, – одним запросом
+        bad_tx_ids = list(
+            StockTransaction.objects
+            .filter(
+                Q(building__isnull=True)
+                | Q(qty=0)
+                | ~Q(tx_type__in=[StockTransaction.Type.IN, StockTransaction.Type.OUT])
+            )
+            .order_by("created_at", "id")
+            .values_list("id", flat=True)
+        )
+        for tx_id in bad_tx_ids:
+            errors.append(f"Ошибка на транзакции id={tx_id}: не указан корпус, количество или тип транзакции.")
+
+        # остаток корпуса по ходу журнала: выдача в минус – ошибка, даже если позже
+        # был приход и итог положительный (replay через apply_transaction на ней падает)
+        overdrafts = (
+            StockTransaction.objects
+            .filter(building__isnull=False, tx_type__in=[StockTransaction.Type.IN, StockTransaction.Type.OUT])
+            .annotate(
+                signed=SIGNED,
+                running=Window(
+                    SIGNED_QTY,
+                    partition_by=[F("building_id"), F("cartridge_id"), F("on_balance")],
+                    order_by=[F("created_at").asc(), F("id").asc()],
+                ),
+            )
+            # только переход через ноль (до этой строки остаток был >= 0), а не каждая строка в минусе
+            .filter(running__lt=0, running__gte=F("signed"))
+            .order_by("created_at", "id")
+            .values_list("id", "building_id", "cartridge_id", "running")
+        )
+        for tx_id, building_id, cartridge_id, running in overdrafts:
+            errors.append(
+                f"Ошибка на транзакции id={tx_id}: недостаточно картриджей на складе корпуса "
+                f"id={building_id} (картридж id={cartridge_id}), остаток после неё {running}."
+            )
+
+        if errors:
+            raise CommandError("\n".join(errors))
+
+        building_rows = list(
+            StockTransaction.objects
+            .values("building_id", "cartridge_id", "on_balance")
+            .annotate(qty=SIGNED_QTY)
+            .order_by()
+        )
+
+        # общий остаток – сумма остатков корпусов, второй проход по журналу не нужен
+        global_qty = {}
+        for row in building_rows:
+            key = (row["cartridge_id"], row["on_balance"])
+            global_qty[key] = global_qty.get(key, 0) + row["qty"]
 
-        self.stdout.write(self.style.SUCCESS("Остатки успешно пересобраны."))
\ No newline at end of file
+        BuildingStock.objects.bulk_create([BuildingStock(**row) for row in building_rows], batch_size=1000)
+        GlobalStock.objects.bulk_create(
+            [
+                GlobalStock(cartridge_id=cartridge_id, on_balance=on_balance, qty=qty)
+                for (cartridge_id, on_balance), qty in global_qty.items()
+            ],
+            batch_size=1000,
+        )
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-15 17:54
+
+import re
+
+from django.db import migrations, models
+
+
+def fill_room_number_int(apps, schema_editor):
+    Room = apps.get_model("inventory", "Room")
+    rooms = list(Room.objects.only("id", "number"))
+    for room in rooms:
+        # не больше 9 цифр – иначе не влезает в integer (как room_number_int)
+        digits = re.sub(r"[^0-9]", "", room.number or "")[:9]
+        room.number_int = int(digits) if digits else 0
+    Room.objects.bulk_update(rooms, ["number_int"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0004_stocktransaction_building_snapshot_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='room',
+            name='number_int',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_room_number_int, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='room',
+            index=models.Index(fields=['building', 'number_int', 'number'], name='room_bld_numint_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-15 18:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0005_room_number_int'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stocktransaction',
+            index=models.Index(fields=['created_at', 'id'], name='tx_created_id_idx'),
+        ),
+    ]
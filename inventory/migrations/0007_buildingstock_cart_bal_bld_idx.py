@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-15 18:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0006_stocktransaction_tx_created_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='buildingstock',
+            index=models.Index(fields=['cartridge', 'on_balance', 'building'], include=('qty',), name='bstock_cart_bal_bld_idx'),
+        ),
+    ]
@@ -19,8 +19,19 @@ class DeleteConfirmContextMixin:
 
     delete_kind = "объект"  # можно переопределять в DeleteView
 
+    def get_object(self, queryset=None):
+        # get() / get_context_data() / post() / form_valid() спрашивают объект несколько раз –
+        # SELECT делаем один раз за запрос
+        if queryset is not None:
+            return super().get_object(queryset)
+        if not hasattr(self, "_delete_object"):
+            self._delete_object = super().get_object()
+        return self._delete_object
+
     def get_delete_report(self):
-        return build_delete_report(self.get_object())
+        if not hasattr(self, "_delete_report"):
+            self._delete_report = build_delete_report(self.get_object())
+        return self._delete_report
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+from django.utils.functional import cached_property
+
+from inventory.form_choices import cached_buildings
+
+
+class QueryParamMixin:
+    """
+    Общие GET-параметры списков, разобранные один раз за запрос:
+      - q (строка поиска)
+      - building_id (фильтр по корпусу, строкой – как приходит из URL)
+    """
+
+    @cached_property
+    def q(self) -> str:
+        return (self.request.GET.get("q") or "").strip()
+
+    @cached_property
+    def building_id(self) -> str:
+        return (self.request.GET.get("building") or "").strip()
+
+
+class BuildingFilterContextMixin(QueryParamMixin):
+    """
+    Фильтр списка по корпусу: кладёт в контекст
+      - buildings (из кэша справочника, одинаковый для всех списков)
+      - selected_building_id
+    """
+
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        ctx["buildings"] = cached_buildings(require=[self.building_id])
+        ctx["selected_building_id"] = self.building_id
+        return ctx
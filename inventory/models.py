@@ -1,3 +1,5 @@
+import re
+
 from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.db import models
@@ -12,16 +14,43 @@ class Building(models.Model):
         return self.name
 
 
+_NON_DIGITS_RE = re.compile(r"[^0-9]")
+
+# number_int – обычный integer (int4): больше 9 цифр не влезает, хвост для сортировки не важен
+ROOM_NUMBER_INT_DIGITS = 9
+
+
+def room_number_int(number: str) -> int:
+    """Числовая часть номера кабинета для «натуральной» сортировки: "2-14" -> 214, "A" -> 0."""
+    digits = _NON_DIGITS_RE.sub("", number or "")[:ROOM_NUMBER_INT_DIGITS]
+    return int(digits) if digits else 0
+
+
 class Room(models.Model):
     building = models.ForeignKey(Building, on_delete=models.CASCADE, related_name="rooms")
     number = models.CharField(max_length=30)
     owner_name = models.CharField(max_length=255, blank=True)
     owner_email = models.EmailField(blank=True)
 
+    # Хранимая числовая часть номера (см. room_number_int) – чтобы сортировать по индексу,
+    # а не гонять regexp_replace по всей таблице в каждом запросе.
+    # Пересчитывается только в save(): queryset.update(number=...) оставит его устаревшим.
+    number_int = models.IntegerField(default=0, editable=False)
+
     class Meta:
         constraints = [
             UniqueConstraint(fields=["building", "number"], name="uniq_room_in_building")
         ]
+        indexes = [
+            models.Index(fields=["building", "number_int", "number"], name="room_bld_numint_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.number_int = room_number_int(self.number)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "number" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "number_int"}
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.building} – {self.number}"
@@ -101,6 +130,16 @@ class BuildingStock(models.Model):
         constraints = [
             UniqueConstraint(fields=["building", "cartridge", "on_balance"], name="uniq_building_stock_balance")
         ]
+        # Поиск «по корпусу» обслуживает уникальный индекс выше; остатки картриджа по всем корпусам
+        # (выдача, главная) ищутся по cartridge + on_balance – qty в индексе, чтобы в PostgreSQL
+        # хватало index-only scan без чтения таблицы
+        indexes = [
+            models.Index(
+                fields=["cartridge", "on_balance", "building"],
+                include=["qty"],
+                name="bstock_cart_bal_bld_idx",
+            ),
+        ]
 
     def __str__(self):
         flag = " (на балансе)" if self.on_balance else ""
@@ -141,6 +180,12 @@ class StockTransaction(models.Model):
 
     issued_to_snapshot = models.CharField(max_length=255, blank=True)
 
+    class Meta:
+        indexes = [
+            # хронологический порядок журнала: rebuild_stock, выгрузка, список операций
+            models.Index(fields=["created_at", "id"], name="tx_created_id_idx"),
+        ]
+
     def clean(self):
         if self.qty == 0:
             raise ValidationError("Количество должно быть больше 0.")
@@ -150,9 +195,13 @@ class StockTransaction(models.Model):
                 raise ValidationError("Для выдачи нужно указать принтер.")
 
         # Проверка совместимости
-        if self.printer and self.cartridge:
-            pm = self.printer.printer_model
-            if not self.cartridge.compatible_printers.filter(pk=pm.pk).exists():
+        # (по id через M2M-таблицу – сами картридж и модель принтера загружать не нужно)
+        if self.printer and self.cartridge_id:
+            compatible = CartridgeModel.compatible_printers.through.objects.filter(
+                cartridgemodel_id=self.cartridge_id,
+                printermodel_id=self.printer.printer_model_id,
+            )
+            if not compatible.exists():
                 raise ValidationError("Этот картридж не подходит к выбранному принтеру.")
 
     def __str__(self):
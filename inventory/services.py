@@ -1,24 +1,32 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-
 from django.core.exceptions import ValidationError
 from django.db import transaction
+from django.db.models import F
 
 from .models import BuildingStock, GlobalStock, StockTransaction
 
 
-@dataclass(frozen=True)
-class StockDelta:
-    """Удобно для отладки / логов."""
-    global_before: int
-    global_after: int
-    building_before: int
-    building_after: int
+def _add_qty(model, lookup: dict, qty: int) -> None:
+    """qty += qty одним UPDATE; если строки остатка ещё нет – создаём её."""
+    if model.objects.filter(**lookup).update(qty=F("qty") + qty):
+        return
+    _, created = model.objects.get_or_create(**lookup, defaults={"qty": qty})
+    if not created:
+        # строку успели создать параллельно – просто прибавляем
+        model.objects.filter(**lookup).update(qty=F("qty") + qty)
+
+
+def _take_qty(model, lookup: dict, qty: int, error: str) -> None:
+    """qty -= qty, только если хватает: проверка и списание – один атомарный UPDATE."""
+    if model.objects.filter(**lookup, qty__gte=qty).update(qty=F("qty") - qty):
+        return
+    have = model.objects.filter(**lookup).values_list("qty", flat=True).first() or 0
+    raise ValidationError(error.format(have=have, need=qty))
 
 
 @transaction.atomic
-def apply_transaction(tx: StockTransaction) -> StockDelta:
+def apply_transaction(tx: StockTransaction) -> None:
     """
     Применяет транзакцию к остаткам:
       - GlobalStock (по школе)
@@ -41,47 +49,24 @@ def apply_transaction(tx: StockTransaction) -> StockDelta:
         raise ValidationError("Количество должно быть больше 0.")
 
     flag = bool(tx.on_balance)
-
-    g, _ = GlobalStock.objects.select_for_update().get_or_create(
-        cartridge_id=tx.cartridge_id,
-        on_balance=flag,
-        defaults={"qty": 0},
-    )
-    b, _ = BuildingStock.objects.select_for_update().get_or_create(
-        building_id=tx.building_id,
-        cartridge_id=tx.cartridge_id,
-        on_balance=flag,
-        defaults={"qty": 0},
-    )
-
-    gb = g.qty
-    bb = b.qty
+    global_key = {"cartridge_id": tx.cartridge_id, "on_balance": flag}
+    building_key = {"building_id": tx.building_id, **global_key}
 
     if tx.tx_type == StockTransaction.Type.IN:
-        g.qty = gb + tx.qty
-        b.qty = bb + tx.qty
+        _add_qty(GlobalStock, global_key, tx.qty)
+        _add_qty(BuildingStock, building_key, tx.qty)
 
     elif tx.tx_type == StockTransaction.Type.OUT:
-        if gb < tx.qty:
-            raise ValidationError(
-                f"Недостаточно картриджей в общем остатке: есть {gb}, нужно {tx.qty}."
-            )
-        if bb < tx.qty:
-            raise ValidationError(
-                f"Недостаточно картриджей на складе корпуса: есть {bb}, нужно {tx.qty}."
-            )
-        g.qty = gb - tx.qty
-        b.qty = bb - tx.qty
+        # сначала корпус-источник: его нехватка – обычная ошибка пользователя при выдаче;
+        # если не хватит общего остатка – atomic откатит и списание из корпуса
+        _take_qty(
+            BuildingStock, building_key, tx.qty,
+            "Недостаточно картриджей на складе корпуса: есть {have}, нужно {need}.",
+        )
+        _take_qty(
+            GlobalStock, global_key, tx.qty,
+            "Недостаточно картриджей в общем остатке: есть {have}, нужно {need}.",
+        )
 
     else:
         raise ValidationError("Неизвестный тип транзакции.")
-
-    g.save(update_fields=["qty"])
-    b.save(update_fields=["qty"])
-
-    return StockDelta(
-        global_before=gb,
-        global_after=g.qty,
-        building_before=bb,
-        building_after=b.qty,
-    )
\ No newline at end of file
@@ -0,0 +1,21 @@
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .form_choices import BUILDING_CHOICES_KEY, CARTRIDGE_CHOICES_KEY, PRINTER_MODEL_CHOICES_KEY
+from .models import Building, CartridgeModel, PrinterModel
+
+
+@receiver([post_save, post_delete], sender=Building)
+def on_building_changed(sender, **kwargs):
+    cache.delete(BUILDING_CHOICES_KEY)
+
+
+@receiver([post_save, post_delete], sender=PrinterModel)
+def on_printer_model_changed(sender, **kwargs):
+    cache.delete(PRINTER_MODEL_CHOICES_KEY)
+
+
+@receiver([post_save, post_delete], sender=CartridgeModel)
+def on_cartridge_model_changed(sender, **kwargs):
+    cache.delete(CARTRIDGE_CHOICES_KEY)
@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+from django.db.models import Case, F, IntegerField, Sum, When
+
+from .models import BuildingStock, GlobalStock
+
+
+def _qty_where(on_balance: bool):
+    return Sum(
+        Case(
+            When(on_balance=on_balance, then=F("qty")),
+            default=0,
+            output_field=IntegerField(),
+        )
+    )
+
+
+def stock_maps():
+    """
+    Остатки по всем картриджам:
+      - global_map: (cartridge_id, on_balance) -> qty
+      - building_map: cartridge_id -> {building_id: {"on": qty, "off": qty}} (только где qty > 0)
+
+    Читаются напрямую из GlobalStock/BuildingStock: таблицы малы (картриджи × корпуса × 2),
+    поэтому кэш не нужен и результат всегда актуален, в том числе сразу после rebuild_stock.
+    """
+    global_map = {
+        (cartridge_id, on_balance): qty
+        for cartridge_id, on_balance, qty in GlobalStock.objects.values_list("cartridge_id", "on_balance", "qty")
+    }
+
+    # строки «на балансе / нет» одного корпуса сворачивает сама БД: одна строка на (картридж, корпус)
+    building_map = {}
+    for cartridge_id, building_id, on_qty, off_qty in (
+        BuildingStock.objects
+        .filter(qty__gt=0)
+        .values("cartridge_id", "building_id")
+        .annotate(on=_qty_where(True), off=_qty_where(False))
+        .values_list("cartridge_id", "building_id", "on", "off")
+        .order_by()
+    ):
+        building_map.setdefault(cartridge_id, {})[building_id] = {"on": on_qty, "off": off_qty}
+
+    return global_map, building_map
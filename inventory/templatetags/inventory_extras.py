@@ -1,13 +1,13 @@
+from functools import lru_cache
+
 from django import template
 
 register = template.Library()
 
 @register.filter
 def get_item(d, key):
-    try:
-        return d.get(key)
-    except Exception:
-        return None
+    # вызывается на каждую ячейку таблиц остатков – без try/except
+    return d.get(key) if isinstance(d, dict) else None
 
 @register.filter
 def short_fio(value):
@@ -16,32 +16,18 @@ def short_fio(value):
     """
     if not value:
         return value
+    return _short_fio(str(value))
+
 
-    parts = value.strip().split()
+@lru_cache(maxsize=4096)
+def _short_fio(value: str) -> str:
+    # в списках одни и те же ответственные повторяются на множестве строк – считаем один раз
+    parts = value.split()
 
     if len(parts) == 1:
         return parts[0]
 
     last_name = parts[0]
-    initials = []
-
-    for p in parts[1:]:
-        if p:
-            initials.append(p[0] + ".")
+    initials = [p[0] + "." for p in parts[1:]]
 
     return f"{last_name} {' '.join(initials)}"
-
-
-@register.simple_tag
-def stock_key(cartridge_id: int, on_balance: int) -> str:
-    """Ключ для stock_map: 'cartridge_id:0/1'."""
-    return f"{cartridge_id}:{int(on_balance)}"
-
-
-@register.simple_tag
-def bstock_key(cartridge_id: int, building_id: int) -> str:
-    """
-    Ключ для карты остатков по корпусам:
-      'cartridge_id:building_id' -> {'on': qty, 'off': qty}
-    """
-    return f"{cartridge_id}:{building_id}"
\ No newline at end of file
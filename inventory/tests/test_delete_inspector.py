@@ -0,0 +1,64 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from inventory.models import Building, CartridgeModel, Printer, PrinterModel, Room, StockTransaction
+from inventory.utils.delete_inspector import build_delete_report, get_deleteability_map
+
+
+class DeleteabilityMapTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = get_user_model().objects.create_user("storekeeper")
+        cls.empty = Building.objects.create(name="Пустой корпус")
+        cls.with_printer = Building.objects.create(name="Корпус с принтером")
+        cls.with_journal = Building.objects.create(name="Корпус со складом")
+
+        Room.objects.create(building=cls.empty, number="101")
+        cls.room = Room.objects.create(building=cls.with_printer, number="2-14")
+        cls.free_room = Room.objects.create(building=cls.with_printer, number="215")
+
+        cls.used_model = PrinterModel.objects.create(vendor="HP", model="LaserJet M402")
+        cls.unused_model = PrinterModel.objects.create(vendor="Canon", model="i-SENSYS")
+        Printer.objects.create(room=cls.room, printer_model=cls.used_model)
+
+        cls.cartridge = CartridgeModel.objects.create(vendor="HP", code="CF226A")
+        StockTransaction.objects.create(
+            created_by=user, tx_type=StockTransaction.Type.IN, cartridge=cls.cartridge,
+            building=cls.with_journal, qty=1,
+        )
+
+    def test_buildings(self):
+        # принтер защищает корпус через каскад корпус -> кабинет, журнал – напрямую
+        self.assertEqual(
+            get_deleteability_map([self.empty, self.with_printer, self.with_journal]),
+            {self.empty.pk: True, self.with_printer.pk: False, self.with_journal.pk: False},
+        )
+
+    def test_rooms_and_printer_models(self):
+        self.assertEqual(
+            get_deleteability_map([self.room, self.free_room]),
+            {self.room.pk: False, self.free_room.pk: True},
+        )
+        self.assertEqual(
+            get_deleteability_map([self.used_model, self.unused_model]),
+            {self.used_model.pk: False, self.unused_model.pk: True},
+        )
+
+    def test_cascade_only_model(self):
+        # журнал картриджа удаляется каскадом – он удаление не блокирует
+        self.assertEqual(get_deleteability_map([self.cartridge]), {self.cartridge.pk: True})
+
+    def test_empty(self):
+        self.assertEqual(get_deleteability_map([]), {})
+
+    def test_matches_delete_report(self):
+        objects = [
+            self.empty, self.with_printer, self.with_journal, self.room, self.free_room,
+            self.used_model, self.unused_model, self.cartridge,
+        ]
+        for obj in objects:
+            with self.subTest(obj=obj):
+                self.assertEqual(
+                    get_deleteability_map([obj])[obj.pk],
+                    build_delete_report(obj).can_delete,
+                )
@@ -0,0 +1,122 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from inventory.models import Building, BuildingStock, CartridgeModel, GlobalStock, StockTransaction
+
+
+def stock_snapshot():
+    return (
+        sorted(GlobalStock.objects.values_list("cartridge_id", "on_balance", "qty")),
+        sorted(BuildingStock.objects.values_list("building_id", "cartridge_id", "on_balance", "qty")),
+    )
+
+
+class RebuildStockTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user("storekeeper")
+        cls.main = Building.objects.create(name="Главный корпус")
+        cls.annex = Building.objects.create(name="Пристройка")
+        cls.black = CartridgeModel.objects.create(vendor="HP", code="CF283A")
+        cls.color = CartridgeModel.objects.create(vendor="HP", code="CF541A")
+
+    def journal(self, *rows):
+        StockTransaction.objects.bulk_create([
+            StockTransaction(
+                created_by=self.user, tx_type=tx_type, cartridge=cartridge,
+                building=building, qty=qty, on_balance=on_balance,
+            )
+            for tx_type, cartridge, building, qty, on_balance in rows
+        ])
+
+    def rebuild(self, *args):
+        call_command("rebuild_stock", *args, stdout=StringIO())
+
+    def test_aggregation_matches_legacy(self):
+        IN, OUT = StockTransaction.Type.IN, StockTransaction.Type.OUT
+        self.journal(
+            (IN, self.black, self.main, 5, False),
+            (IN, self.black, self.annex, 2, False),
+            (IN, self.black, self.main, 1, True),
+            (OUT, self.black, self.main, 3, False),
+            (IN, self.color, self.annex, 4, False),
+            (OUT, self.color, self.annex, 4, False),
+        )
+
+        self.rebuild("--legacy")
+        legacy = stock_snapshot()
+        self.rebuild()
+
+        self.assertEqual(stock_snapshot(), legacy)
+        self.assertIn((self.black.pk, False, 4), legacy[0])
+        self.assertIn((self.main.pk, self.black.pk, False, 2), legacy[1])
+
+    def test_errors_are_collected_and_stock_is_kept(self):
+        IN, OUT = StockTransaction.Type.IN, StockTransaction.Type.OUT
+        self.journal(
+            (IN, self.black, self.main, 2, False),
+            (OUT, self.black, self.main, 3, False),
+            (OUT, self.color, self.annex, 1, False),
+            (IN, self.color, None, 1, False),
+        )
+        GlobalStock.objects.create(cartridge=self.black, on_balance=False, qty=7)
+        BuildingStock.objects.create(building=self.main, cartridge=self.black, on_balance=False, qty=7)
+        before = stock_snapshot()
+
+        with self.assertRaises(CommandError) as ctx:
+            self.rebuild()
+
+        # все ошибки журнала – в одном сообщении, а не только первая
+        message = str(ctx.exception)
+        self.assertIn("не указан корпус", message)
+        overdraft_ids = list(
+            StockTransaction.objects.filter(tx_type=OUT).order_by("id").values_list("id", flat=True)
+        )
+        for tx_id in overdraft_ids:
+            self.assertIn(f"Ошибка на транзакции id={tx_id}: недостаточно картриджей", message)
+
+        # удаление остатков откатилось вместе с командой
+        self.assertEqual(stock_snapshot(), before)
+
+    def test_negative_midway_is_an_error(self):
+        # итог по корпусу нулевой, но выдача прошла раньше прихода – replay на ней падает
+        IN, OUT = StockTransaction.Type.IN, StockTransaction.Type.OUT
+        self.journal(
+            (IN, self.black, self.main, 2, False),
+            (OUT, self.black, self.main, 5, False),
+            (OUT, self.black, self.main, 1, False),
+            (IN, self.black, self.main, 10, False),
+            (OUT, self.black, self.annex, 1, True),
+            (IN, self.black, self.annex, 1, True),
+        )
+        out_main_5, out_main_1, out_annex = (
+            StockTransaction.objects.filter(tx_type=OUT).order_by("id").values_list("id", flat=True)
+        )
+
+        with self.assertRaises(CommandError) as ctx:
+            self.rebuild()
+
+        # по одной ошибке на каждый переход через ноль, с id транзакции и остатком после неё
+        lines = str(ctx.exception).splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertIn(f"id={out_main_5}:", lines[0])
+        self.assertIn("остаток после неё -3", lines[0])
+        self.assertIn(f"id={out_annex}:", lines[1])
+        # вторая выдача в том же минусе отдельной ошибкой не считается
+        self.assertNotIn(f"id={out_main_1}:", str(ctx.exception))
+        self.assertFalse(BuildingStock.objects.exists())
+
+    def test_legacy_rejects_the_same_journal(self):
+        IN, OUT = StockTransaction.Type.IN, StockTransaction.Type.OUT
+        self.journal(
+            (OUT, self.black, self.main, 5, False),
+            (IN, self.black, self.main, 5, False),
+        )
+        out_id = StockTransaction.objects.get(tx_type=OUT).id
+
+        for args in ((), ("--legacy",)):
+            with self.subTest(args=args), self.assertRaisesMessage(CommandError, f"id={out_id}:"):
+                self.rebuild(*args)
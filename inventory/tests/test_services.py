@@ -0,0 +1,121 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db.models import QuerySet
+from django.test import TestCase
+
+from inventory.models import Building, BuildingStock, CartridgeModel, GlobalStock, StockTransaction
+from inventory.services import _add_qty, apply_transaction
+
+
+class ApplyTransactionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user("storekeeper")
+        cls.main = Building.objects.create(name="Главный корпус")
+        cls.annex = Building.objects.create(name="Пристройка")
+        cls.cartridge = CartridgeModel.objects.create(vendor="HP", code="CF283A")
+
+    def tx(self, tx_type, qty, building=None, on_balance=False):
+        # объект не сохраняем: apply_transaction читает только поля
+        return StockTransaction(
+            created_by=self.user,
+            tx_type=tx_type,
+            cartridge=self.cartridge,
+            qty=qty,
+            building=building or self.main,
+            on_balance=on_balance,
+        )
+
+    def global_qty(self, on_balance=False):
+        return GlobalStock.objects.get(cartridge=self.cartridge, on_balance=on_balance).qty
+
+    def building_qty(self, building, on_balance=False):
+        return BuildingStock.objects.get(building=building, cartridge=self.cartridge, on_balance=on_balance).qty
+
+    def test_in_creates_rows_then_adds(self):
+        apply_transaction(self.tx(StockTransaction.Type.IN, 3))
+        apply_transaction(self.tx(StockTransaction.Type.IN, 2))
+
+        self.assertEqual(self.global_qty(), 5)
+        self.assertEqual(self.building_qty(self.main), 5)
+        self.assertEqual(GlobalStock.objects.count(), 1)
+        self.assertEqual(BuildingStock.objects.count(), 1)
+
+    def test_on_balance_is_a_separate_row(self):
+        apply_transaction(self.tx(StockTransaction.Type.IN, 3))
+        apply_transaction(self.tx(StockTransaction.Type.IN, 1, on_balance=True))
+
+        self.assertEqual(self.global_qty(), 3)
+        self.assertEqual(self.global_qty(on_balance=True), 1)
+
+    def test_out_takes_from_building_and_global(self):
+        apply_transaction(self.tx(StockTransaction.Type.IN, 5))
+        apply_transaction(self.tx(StockTransaction.Type.OUT, 5))
+
+        self.assertEqual(self.global_qty(), 0)
+        self.assertEqual(self.building_qty(self.main), 0)
+
+    def test_out_insufficient_in_building(self):
+        apply_transaction(self.tx(StockTransaction.Type.IN, 5, building=self.annex))
+        apply_transaction(self.tx(StockTransaction.Type.IN, 1))
+
+        # в школе картриджей хватает, но не на складе этого корпуса
+        with self.assertRaisesMessage(ValidationError, "на складе корпуса: есть 1, нужно 2"):
+            apply_transaction(self.tx(StockTransaction.Type.OUT, 2))
+
+        self.assertEqual(self.building_qty(self.main), 1)
+        self.assertEqual(self.global_qty(), 6)
+
+    def test_out_without_building_row(self):
+        with self.assertRaisesMessage(ValidationError, "на складе корпуса: есть 0, нужно 1"):
+            apply_transaction(self.tx(StockTransaction.Type.OUT, 1))
+
+    def test_out_insufficient_globally_rolls_back_building(self):
+        apply_transaction(self.tx(StockTransaction.Type.IN, 3))
+        # общий остаток разошёлся с корпусом (правка мимо журнала)
+        GlobalStock.objects.filter(cartridge=self.cartridge).update(qty=1)
+
+        with self.assertRaisesMessage(ValidationError, "в общем остатке: есть 1, нужно 2"):
+            apply_transaction(self.tx(StockTransaction.Type.OUT, 2))
+
+        # списание из корпуса откатилось вместе с транзакцией
+        self.assertEqual(self.building_qty(self.main), 3)
+        self.assertEqual(self.global_qty(), 1)
+
+    def test_validation_errors(self):
+        cases = [
+            (self.tx(StockTransaction.Type.IN, 0), "больше 0"),
+            (StockTransaction(tx_type=StockTransaction.Type.IN, cartridge=self.cartridge, qty=1), "корпус"),
+            (self.tx("XX", 1), "Неизвестный тип"),
+        ]
+        for tx, message in cases:
+            with self.subTest(message=message), self.assertRaisesMessage(ValidationError, message):
+                apply_transaction(tx)
+
+        self.assertFalse(GlobalStock.objects.exists())
+        self.assertFalse(BuildingStock.objects.exists())
+
+
+class AddQtyTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cartridge = CartridgeModel.objects.create(vendor="HP", code="CE285A")
+
+    def test_row_created_concurrently(self):
+        # первый UPDATE «не видит» строку, которую параллельно создал другой запрос:
+        # get_or_create находит её, и количество прибавляется вторым UPDATE
+        GlobalStock.objects.create(cartridge=self.cartridge, on_balance=False, qty=2)
+        real_update = QuerySet.update
+        calls = []
+
+        def update(qs, **kwargs):
+            calls.append(kwargs)
+            return 0 if len(calls) == 1 else real_update(qs, **kwargs)
+
+        with mock.patch.object(QuerySet, "update", update):
+            _add_qty(GlobalStock, {"cartridge_id": self.cartridge.pk, "on_balance": False}, 3)
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(GlobalStock.objects.get(cartridge=self.cartridge).qty, 5)
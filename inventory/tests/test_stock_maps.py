@@ -0,0 +1,31 @@
+from django.test import TestCase
+
+from inventory.models import Building, BuildingStock, CartridgeModel, GlobalStock
+from inventory.stock_maps import stock_maps
+
+
+class StockMapsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.building = Building.objects.create(name="Главный корпус")
+        cls.cartridge = CartridgeModel.objects.create(vendor="HP", code="CF283A")
+
+    def set_building_qty(self, on_balance, qty):
+        BuildingStock.objects.update_or_create(
+            cartridge=self.cartridge, building=self.building, on_balance=on_balance, defaults={"qty": qty},
+        )
+
+    def test_building_rows_folded_by_balance(self):
+        self.set_building_qty(True, 3)
+        self.set_building_qty(False, 1)
+        self.assertEqual(
+            stock_maps()[1], {self.cartridge.pk: {self.building.pk: {"on": 3, "off": 1}}},
+        )
+
+    def test_changes_outside_journal_visible_at_once(self):
+        GlobalStock.objects.create(cartridge=self.cartridge, on_balance=False, qty=2)
+        self.assertEqual(stock_maps()[0], {(self.cartridge.pk, False): 2})
+
+        # rebuild_stock пишет в таблицы остатков мимо журнала – устаревших карт быть не должно
+        GlobalStock.objects.filter(cartridge=self.cartridge).update(qty=1)
+        self.assertEqual(stock_maps()[0], {(self.cartridge.pk, False): 1})
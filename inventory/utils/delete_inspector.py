@@ -2,10 +2,10 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Dict, Iterable, List, Type
+from typing import Dict, Iterable, List, Tuple, Type
 
 from django.db import router
-from django.db.models import Model
+from django.db.models import CASCADE, PROTECT, Exists, Model, OuterRef
 from django.db.models.deletion import Collector, ProtectedError
 
 
@@ -100,21 +100,50 @@ def build_delete_report(obj: Model) -> DeleteReport:
     )
 
 
+def _protected_paths(model: Type[Model], path: str = "", depth: int = 0) -> List[Tuple[Type[Model], str]]:
+    """
+    Связи PROTECT, до которых удаление model дойдёт по каскаду:
+    (модель со ссылкой, lookup от неё до удаляемого объекта).
+    Например, для Building: (Printer, "room__building"), (StockTransaction, "building").
+    """
+    paths: List[Tuple[Type[Model], str]] = []
+    if depth > 5:
+        return paths
+
+    for rel in model._meta.related_objects:
+        if rel.many_to_many:
+            # строки M2M-таблицы просто удаляются
+            continue
+        lookup = f"{rel.field.name}__{path}" if path else rel.field.name
+        if rel.on_delete is PROTECT:
+            paths.append((rel.related_model, lookup))
+        elif rel.on_delete is CASCADE:
+            paths.extend(_protected_paths(rel.related_model, lookup, depth + 1))
+    return paths
+
+
 def get_deleteability_map(items: Iterable[Model]) -> Dict[int, bool]:
+    """
+    {pk: можно ли удалить} для страницы списка – одним запросом с EXISTS
+    по каждой достижимой PROTECT-связи, вместо Collector.collect() на каждый объект.
+    """
     items = list(items)
     if not items:
         return {}
 
-    using = router.db_for_write(items[0].__class__)
-    result: Dict[int, bool] = {}
-
-    for obj in items:
-        collector = Collector(using=using)
-        try:
-            collector.collect([obj])
-            result[obj.pk] = len(getattr(collector, "protected", []) or []) == 0
-        except ProtectedError:
-            # ✅ Важно: НЕ падать на списках.
-            result[obj.pk] = False
-
-    return result
\ No newline at end of file
+    model = items[0].__class__
+    paths = _protected_paths(model)
+    if not paths:
+        return {obj.pk: True for obj in items}
+
+    flags = {
+        f"protected_{i}": Exists(related._base_manager.filter(**{lookup: OuterRef("pk")}))
+        for i, (related, lookup) in enumerate(paths)
+    }
+    rows = (
+        model._base_manager
+        .filter(pk__in=[obj.pk for obj in items])
+        .annotate(**flags)
+        .values_list("pk", *flags)
+    )
+    return {pk: not any(protected) for pk, *protected in rows}
\ No newline at end of file
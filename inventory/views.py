@@ -1,15 +1,14 @@
+from django.contrib.auth import get_user_model
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.db.models import Q
-from django.shortcuts import redirect
+from django.db.models import Exists, OuterRef, Prefetch, Q
+from django.shortcuts import get_object_or_404, redirect
 from django.urls import reverse_lazy
 from django.db import transaction
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView, TemplateView
 from django.core.exceptions import ValidationError
+from django.utils.functional import cached_property
 
-from django.db import connection
-from django.db.models import IntegerField, Value
-from django.db.models.functions import Cast, Coalesce, NullIf
-from django.db.models import Func
+from allauth.socialaccount.models import SocialAccount
 
 from .forms import (
     BuildingForm, RoomForm, PrinterModelForm, CartridgeModelForm, PrinterForm,
@@ -19,9 +18,12 @@ from .models import (
     Building, Room, PrinterModel, CartridgeModel, Printer,
     GlobalStock, BuildingStock, StockTransaction
 )
+from .form_choices import cached_buildings
 from .services import apply_transaction
+from .stock_maps import stock_maps
 
 from inventory.mixins.delete_confirm import DeleteConfirmContextMixin
+from inventory.mixins.query_params import BuildingFilterContextMixin, QueryParamMixin
 from inventory.utils.delete_inspector import get_deleteability_map
 
 
@@ -29,59 +31,96 @@ from inventory.utils.delete_inspector import get_deleteability_map
 # Остатки и журнал
 # -------------------------
 
-class DashboardView(LoginRequiredMixin, TemplateView):
+def compatible_printers_prefetch():
+    # в карточках картриджа выводятся только производитель и модель принтера;
+    # готовым списком (to_attr), чтобы шаблон не собирал queryset через .all на каждую карточку
+    return Prefetch(
+        "compatible_printers",
+        queryset=PrinterModel.objects.only("id", "vendor", "model").order_by("vendor", "model"),
+        to_attr="compatible_printers_list",
+    )
+
+
+# FK транзакции, которые к full_clean() уже проверены: объекты пришли из полей формы
+# (или это request.user) – повторный SELECT по каждому ключу не нужен; clean() модели всё равно выполняется
+TX_FORM_CHECKED_FKS = ["created_by", "cartridge", "building", "printer"]
+
+
+def add_validation_errors(form, error: ValidationError):
+    """Переносит ошибки модели/сервиса в форму: по полям, если поле есть в форме, иначе – в общие."""
+    if not hasattr(error, "error_dict"):
+        for msg in error.messages:
+            form.add_error(None, msg)
+        return
+    for field, errors in error.message_dict.items():
+        for msg in errors:
+            form.add_error(field if field in form.fields else None, msg)
+
+
+class DashboardView(LoginRequiredMixin, QueryParamMixin, TemplateView):
     template_name = "inventory/dashboard.html"
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
 
-        q = (self.request.GET.get("q") or "").strip()
+        q = self.q
 
         cartridges_qs = (
             CartridgeModel.objects
-            .prefetch_related("compatible_printers")
+            .prefetch_related(compatible_printers_prefetch())
             .order_by("vendor", "code")
         )
 
         if q:
-            cartridges_qs = (
-                cartridges_qs.filter(
-                    Q(vendor__icontains=q) |
-                    Q(code__icontains=q) |
-                    Q(title__icontains=q) |
-                    Q(compatible_printers__vendor__icontains=q) |
-                    Q(compatible_printers__model__icontains=q)
-                ).distinct()
+            # совместимые принтеры – через EXISTS: без JOIN по M2M строки не размножаются и distinct() не нужен
+            printer_match = PrinterModel.objects.filter(
+                Q(vendor__icontains=q) | Q(model__icontains=q),
+                compatible_cartridges=OuterRef("pk"),
+            )
+            cartridges_qs = cartridges_qs.filter(
+                Q(vendor__icontains=q) |
+                Q(code__icontains=q) |
+                Q(title__icontains=q) |
+                Exists(printer_match)
             )
 
         cartridges = list(cartridges_qs)
-        buildings = list(Building.objects.order_by("name"))
-
-        # global stock: "cartridge_id:0/1" -> qty
-        stock_map = {
-            f"{s.cartridge_id}:{1 if s.on_balance else 0}": s.qty
-            for s in GlobalStock.objects.all()
-        }
 
-        # building stock: "cartridge_id:building_id" -> {"on": qty, "off": qty}
-        building_stock_map = {}
-        for s in BuildingStock.objects.all():
-            key = f"{s.cartridge_id}:{s.building_id}"
-            bucket = building_stock_map.setdefault(key, {"on": 0, "off": 0})
-            if s.on_balance:
-                bucket["on"] = s.qty
-            else:
-                bucket["off"] = s.qty
+        # остатки – прямо из таблиц GlobalStock/BuildingStock (одна GROUP BY по корпусам)
+        stock_map, building_stock_map = stock_maps()
 
-        # ✅ одна строка = одна модель картриджа
-        stock_rows = [{"cartridge": c} for c in cartridges]
+        # корпус, созданный в другом процессе, может ещё отсутствовать в кэше справочника –
+        # тогда его остатки выпали бы из строк, хотя вошли в итоги
+        stocked_building_ids = {
+            building_id for by_building in building_stock_map.values() for building_id in by_building
+        }
+        buildings = cached_buildings(require=stocked_building_ids)
+
+        # ✅ одна строка = одна модель картриджа;
+        # остатки раскладываем здесь, чтобы шаблон не собирал ключи на каждую ячейку
+        stock_rows = []
+        for c in cartridges:
+            on_total = stock_map.get((c.id, True), 0)
+            off_total = stock_map.get((c.id, False), 0)
+            # корпуса обходим только там, где картридж вообще есть (порядок – как в buildings)
+            by_building = building_stock_map.get(c.id, {})
+            building_stocks = [
+                {"building": b, **by_building[b["id"]]}
+                for b in buildings
+                if b["id"] in by_building
+            ] if by_building else []
+            stock_rows.append({
+                "cartridge": c,
+                "on_total": on_total,
+                "off_total": off_total,
+                "total_qty": on_total + off_total,
+                "building_stocks": building_stocks,
+            })
 
         ctx.update({
             "q": q,
             "stock_rows": stock_rows,
-            "stock_map": stock_map,
             "buildings": buildings,
-            "building_stock_map": building_stock_map,
         })
         return ctx
 
@@ -92,21 +131,22 @@ class BuildingStatsView(LoginRequiredMixin, TemplateView):
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
 
-        building = Building.objects.get(pk=kwargs["pk"])
+        # шаблону нужно только имя; несуществующий корпус – 404, а не 500
+        building = get_object_or_404(Building.objects.only("id", "name"), pk=kwargs["pk"])
         cartridges = (
             CartridgeModel.objects
-            .prefetch_related("compatible_printers")
+            .prefetch_related(compatible_printers_prefetch())
             .order_by("vendor", "code")
         )
 
-        # "cartridge_id" -> {"on": qty, "off": qty}
+        # "cartridge_id" -> {"on": qty, "off": qty} – только строки этого корпуса
         stock_map = {}
-        for s in BuildingStock.objects.filter(building=building):
-            bucket = stock_map.setdefault(s.cartridge_id, {"on": 0, "off": 0})
-            if s.on_balance:
-                bucket["on"] = s.qty
-            else:
-                bucket["off"] = s.qty
+        for cartridge_id, on_balance, qty in (
+            BuildingStock.objects
+            .filter(building=building, qty__gt=0)
+            .values_list("cartridge_id", "on_balance", "qty")
+        ):
+            stock_map.setdefault(cartridge_id, {"on": 0, "off": 0})["on" if on_balance else "off"] = qty
 
         ctx.update({
             "building": building,
@@ -116,27 +156,37 @@ class BuildingStatsView(LoginRequiredMixin, TemplateView):
         return ctx
 
 
-class JournalView(LoginRequiredMixin, ListView):
+class JournalView(LoginRequiredMixin, QueryParamMixin, ListView):
     template_name = "inventory/journal.html"
     context_object_name = "txs"
     paginate_by = 50
 
+    @cached_property
+    def tx_type(self) -> str:
+        return (self.request.GET.get("type") or "").strip().upper()
+
     def get_queryset(self):
         qs = (
             StockTransaction.objects
-            .select_related(
-                "created_by",
-                "cartridge",
-                "building",
-                "printer",
-                "printer__room",
+            # в JOIN – только то, что различается почти в каждой строке;
+            # кабинеты, модели принтеров и авторы повторяются – их подтягиваем отдельными запросами на страницу
+            .select_related("cartridge", "building", "printer")
+            # адрес корпуса и примечание к принтеру журнал не показывает
+            .defer("building__address", "printer__note")
+            .prefetch_related(
+                "printer__room__building",
                 "printer__printer_model",
+                # от автора нужен только логин (пароль, флаги и даты не тянем)
+                Prefetch("created_by", queryset=get_user_model().objects.only("id", "username")),
+                Prefetch("created_by__socialaccount_set", queryset=SocialAccount.objects.order_by("pk")),
             )
-            .order_by("-created_at")
+            # id – для однозначного порядка между страницами; (created_at, id) покрыт tx_created_id_idx,
+            # так что LIMIT/OFFSET идёт обратным проходом по индексу без сортировки
+            .order_by("-created_at", "-id")
         )
 
-        q = (self.request.GET.get("q") or "").strip()
-        tx_type = (self.request.GET.get("type") or "").strip().upper()
+        q = self.q
+        tx_type = self.tx_type
 
         # фильтр по типу движения - выдача или приход на склад
         if tx_type in (StockTransaction.Type.IN, StockTransaction.Type.OUT):
@@ -160,8 +210,8 @@ class JournalView(LoginRequiredMixin, ListView):
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
-        ctx["q"] = (self.request.GET.get("q") or "").strip()
-        ctx["type_filter"] = (self.request.GET.get("type") or "").strip().upper()
+        ctx["q"] = self.q
+        ctx["type_filter"] = self.tx_type
         return ctx
 
 
@@ -181,13 +231,11 @@ class StockInCreateView(LoginRequiredMixin, CreateView):
 
         try:
             with transaction.atomic():
-                tx.full_clean()
+                tx.full_clean(exclude=TX_FORM_CHECKED_FKS, validate_unique=False)
                 tx.save()
                 apply_transaction(tx)
         except ValidationError as e:
-            for field, errors in (e.message_dict or {}).items():
-                for msg in errors:
-                    form.add_error(field if field in form.fields else None, msg)
+            add_validation_errors(form, e)
             return self.form_invalid(form)
         except ValueError as e:
             form.add_error(None, str(e))
@@ -201,15 +249,19 @@ class StockOutCreateView(LoginRequiredMixin, CreateView):
     form_class = StockOutForm
     success_url = reverse_lazy("inventory:journal")
 
-    def _get_ids(self):
+    @cached_property
+    def _ids(self):
+        # (building, room, printer, cartridge_variant) – нужны и get_form_kwargs, и get_context_data
         src = self.request.POST if self.request.method == "POST" else self.request.GET
-        building_id = (src.get("building") or "").strip()
-        room_id = (src.get("room") or "").strip()
-        printer_id = (src.get("printer") or "").strip()
-        cartridge_variant = (src.get("cartridge_variant") or "").strip()
-        return building_id, room_id, printer_id, cartridge_variant
+        return tuple(
+            (src.get(key) or "").strip()
+            for key in ("building", "room", "printer", "cartridge_variant")
+        )
 
-    def _parse_variant(self, cartridge_variant: str):
+    @cached_property
+    def _variant(self):
+        # "<cartridge_id>:<0|1>" -> (cartridge_id, on_balance); (None, None), если не выбран/битый
+        cartridge_variant = self._ids[3]
         if cartridge_variant and ":" in cartridge_variant:
             c_id, flag = cartridge_variant.split(":", 1)
             if c_id.isdigit() and flag in ("0", "1"):
@@ -217,6 +269,14 @@ class StockOutCreateView(LoginRequiredMixin, CreateView):
         return None, None
 
     def _calc_stock(self, cartridge_id: int, on_balance: bool, building_id: int | None):
+        # нужен и в get_form_kwargs, и в get_context_data – за запрос считаем один раз
+        memo = self.__dict__.setdefault("_stock_memo", {})
+        key = (cartridge_id, on_balance, building_id)
+        if key not in memo:
+            memo[key] = self._load_stock(cartridge_id, on_balance, building_id)
+        return memo[key]
+
+    def _load_stock(self, cartridge_id: int, on_balance: bool, building_id: int | None):
         global_qty = (
             GlobalStock.objects
             .filter(cartridge_id=cartridge_id, on_balance=on_balance)
@@ -225,39 +285,34 @@ class StockOutCreateView(LoginRequiredMixin, CreateView):
         )
         global_qty = int(global_qty or 0)
 
+        # остатки этого картриджа по всем корпусам – одним запросом:
+        # из них и остаток выбранного корпуса, и корпуса-источники (где qty > 0), кроме выбранного
         building_qty = None
-        if building_id:
-            building_qty = (
-                BuildingStock.objects
-                .filter(building_id=building_id, cartridge_id=cartridge_id, on_balance=on_balance)
-                .values_list("qty", flat=True)
-                .first()
-            )
-            building_qty = int(building_qty or 0)
-
-        # корпуса-источники (где qty > 0), кроме выбранного корпуса назначения
-        src_qs = (
+        available_source_buildings = []
+        rows = (
             BuildingStock.objects
-            .select_related("building")
-            .filter(cartridge_id=cartridge_id, on_balance=on_balance, qty__gt=0)
+            .filter(cartridge_id=cartridge_id, on_balance=on_balance)
+            .order_by("building__name")
+            .values_list("building_id", "building__name", "qty")
         )
-        if building_id:
-            src_qs = src_qs.exclude(building_id=building_id)
+        for b_id, b_name, qty in rows:
+            if building_id and b_id == building_id:
+                building_qty = qty
+            elif qty > 0:
+                available_source_buildings.append({"id": b_id, "name": b_name, "qty": qty})
 
-        available_source_buildings = [
-            {"id": s.building_id, "name": s.building.name, "qty": s.qty}
-            for s in src_qs.order_by("building__name")
-        ]
+        if building_id:
+            building_qty = int(building_qty or 0)
 
         return global_qty, building_qty, available_source_buildings
 
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
-        building_id, room_id, printer_id, cartridge_variant = self._get_ids()
+        building_id, room_id, printer_id, _ = self._ids
 
         # посчитаем доступные корпуса-источники, чтобы ограничить queryset source_building
         src_ids = None
-        c_id, on_balance = self._parse_variant(cartridge_variant)
+        c_id, on_balance = self._variant
         if c_id and on_balance is not None:
             try:
                 b_id_int = int(building_id) if building_id else None
@@ -277,29 +332,30 @@ class StockOutCreateView(LoginRequiredMixin, CreateView):
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
-        building_id, room_id, printer_id, cartridge_variant = self._get_ids()
+        building_id, room_id, printer_id, _ = self._ids
 
-        selected_building = Building.objects.filter(pk=building_id).first() if building_id else None
-        selected_room = (
-            Room.objects.select_related("building")
-            .filter(pk=room_id).first()
-            if room_id else None
-        )
-        selected_printer = (
-            Printer.objects.select_related("printer_model", "room", "room__building")
-            .filter(pk=printer_id).first()
-            if printer_id else None
-        )
+        form = ctx.get("form")
+
+        # корпус – из кэша справочника ({"id", "name"}), кабинет и принтер – из списков,
+        # которые форма уже загрузила для своих полей; в БД идём, только если там их нет
+        selected_building = next(
+            (b for b in cached_buildings(require=[building_id]) if str(b["id"]) == building_id), None
+        ) if building_id else None
+
+        selected_room = form.fields["room"].preloaded(room_id) if (room_id and form) else None
+        if room_id and selected_room is None:
+            selected_room = Room.objects.select_related("building").filter(pk=room_id).first()
 
-        printers_in_room = []
-        if selected_room:
-            printers_in_room = (
-                Printer.objects
-                .select_related("printer_model")
-                .filter(room=selected_room)
-                .order_by("printer_model__vendor", "printer_model__model", "inventory_tag")
+        selected_printer = form.fields["printer"].preloaded(printer_id) if (printer_id and form) else None
+        if printer_id and selected_printer is None:
+            selected_printer = (
+                Printer.objects.select_related("printer_model", "room", "room__building")
+                .filter(pk=printer_id).first()
             )
 
+        # список принтеров кабинета уже загружен формой – повторно не запрашиваем
+        printers_in_room = form.printers_in_room if (selected_room and form) else []
+
         selected_cartridge = None
         selected_on_balance = None
         building_qty = None
@@ -307,7 +363,7 @@ class StockOutCreateView(LoginRequiredMixin, CreateView):
         available_source_buildings = []
         can_issue = True
 
-        c_id, on_balance = self._parse_variant(cartridge_variant)
+        c_id, on_balance = self._variant
         if c_id and on_balance is not None:
             selected_cartridge = CartridgeModel.objects.filter(pk=c_id).first()
             selected_on_balance = on_balance
@@ -316,7 +372,7 @@ class StockOutCreateView(LoginRequiredMixin, CreateView):
                 global_qty, building_qty, available_source_buildings = self._calc_stock(
                     cartridge_id=selected_cartridge.id,
                     on_balance=selected_on_balance,
-                    building_id=selected_building.id,
+                    building_id=selected_building["id"],
                 )
 
                 # можно ли выдать: либо есть в выбранном корпусе, либо есть в других (и общий остаток позволяет)
@@ -329,16 +385,6 @@ class StockOutCreateView(LoginRequiredMixin, CreateView):
                     len(available_source_buildings) > 0 and global_qty >= desired_qty
                 )
 
-                # важно: если список источников есть, ограничим поле в форме (вдобавок к get_form_kwargs)
-                form = ctx.get("form")
-                if form:
-                    if available_source_buildings:
-                        form.fields["source_building"].queryset = Building.objects.filter(
-                            id__in=[x["id"] for x in available_source_buildings]
-                        ).order_by("name")
-                    else:
-                        form.fields["source_building"].queryset = Building.objects.none()
-
         ctx.update({
             "selected_building": selected_building,
             "selected_room": selected_room,
@@ -401,27 +447,15 @@ class StockOutCreateView(LoginRequiredMixin, CreateView):
         if not tx.building_snapshot and tx.building:
             tx.building_snapshot = tx.building.name
 
-        # проверка остатков в корпусе-источнике
-        bqty = (
-            BuildingStock.objects
-            .filter(building_id=tx.building_id, cartridge_id=tx.cartridge_id, on_balance=tx.on_balance)
-            .values_list("qty", flat=True)
-            .first()
-        ) or 0
-
-        if bqty < tx.qty:
-            form.add_error(None, "Недостаточно картриджей выбранного типа (баланс/не баланс) в корпусе-складе.")
-            return self.form_invalid(form)
-
+        # остаток корпуса-источника отдельно не читаем: apply_transaction списывает его
+        # условным UPDATE и сам сообщает, если картриджей не хватает
         try:
             with transaction.atomic():
-                tx.full_clean()
+                tx.full_clean(exclude=TX_FORM_CHECKED_FKS, validate_unique=False)
                 tx.save()
                 apply_transaction(tx)
         except ValidationError as e:
-            for field, errors in (e.message_dict or {}).items():
-                for msg in errors:
-                    form.add_error(field if field in form.fields else None, msg)
+            add_validation_errors(form, e)
             return self.form_invalid(form)
         except ValueError as e:
             form.add_error(None, str(e))
@@ -483,23 +517,25 @@ class BuildingDelete(LoginRequiredMixin, DeleteConfirmContextMixin, DeleteView):
         return ctx
 
 
-class RoomList(LoginRequiredMixin, ListView):
+class RoomList(LoginRequiredMixin, BuildingFilterContextMixin, ListView):
     model = Room
     template_name = "inventory/crud/room_list.html"
     context_object_name = "items"
     paginate_by = 50
 
     def get_queryset(self):
-        qs = Room.objects.select_related("building").order_by("building__name", "number")
-        building_id = (self.request.GET.get("building") or "").strip()
+        qs = (
+            Room.objects.select_related("building")
+            .only("number", "owner_name", "owner_email", "building__name")
+            .order_by("building__name", "number")
+        )
+        building_id = self.building_id
         if building_id:
             qs = qs.filter(building_id=building_id)
         return qs
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
-        ctx["buildings"] = Building.objects.order_by("name")
-        ctx["selected_building_id"] = (self.request.GET.get("building") or "").strip()
         ctx["deleteability_map"] = get_deleteability_map(ctx.get("items"))
         return ctx
 
@@ -638,7 +674,7 @@ class CartridgeModelDelete(LoginRequiredMixin, DeleteConfirmContextMixin, Delete
         return ctx
 
 
-class PrinterList(LoginRequiredMixin, ListView):
+class PrinterList(LoginRequiredMixin, BuildingFilterContextMixin, ListView):
     model = Printer
     template_name = "inventory/crud/printer_list.html"
     context_object_name = "items"
@@ -648,58 +684,40 @@ class PrinterList(LoginRequiredMixin, ListView):
         qs = (
             Printer.objects
             .select_related("room", "room__building", "printer_model")
-        )
-
-        building_id = (self.request.GET.get("building") or "").strip()
-        if building_id:
-            qs = qs.filter(room__building_id=building_id)
-
-        # Нормальная сортировка кабинетов: корпус -> номер кабинета (числом) -> строкой
-        # Реализуем "натуральную" сортировку для PostgreSQL.
-        if connection.vendor == "postgresql":
-            # Вытаскиваем только цифры из room.number: "2-14" -> "214", "101" -> "101"
-            digits_only = Func(
-                "room__number",
-                Value(r"[^0-9]"),
-                Value(""),
-                Value("g"),
-                function="regexp_replace",
-            )
-
-            qs = qs.annotate(
-                room_num_int=Coalesce(
-                    Cast(NullIf(digits_only, Value("")), IntegerField()),
-                    Value(0),
-                )
-            ).order_by(
-                "room__building__name",
-                "room_num_int",
-                "room__number",
-                "printer_model__vendor",
-                "printer_model__model",
+            # список показывает только модель, корпус, кабинет и инв. номер – примечание и прочее не тянем
+            .only(
                 "inventory_tag",
-            )
-        else:
-            # Фолбэк: без извлечения чисел (для SQLite/MySQL).
-            qs = qs.order_by(
-                "room__building__name",
                 "room__number",
+                "room__building__name",
                 "printer_model__vendor",
                 "printer_model__model",
-                "inventory_tag",
             )
+        )
+
+        building_id = self.building_id
+        if building_id:
+            qs = qs.filter(room__building_id=building_id)
+
+        # Нормальная сортировка кабинетов: корпус -> номер кабинета (числом) -> строкой.
+        # Числовая часть номера хранится в Room.number_int – regexp по строкам не нужен
+        qs = qs.order_by(
+            "room__building__name",
+            "room__number_int",
+            "room__number",
+            "printer_model__vendor",
+            "printer_model__model",
+            "inventory_tag",
+        )
 
         return qs
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
-        ctx["buildings"] = Building.objects.order_by("name")
-        ctx["selected_building_id"] = (self.request.GET.get("building") or "").strip()
         ctx["deleteability_map"] = get_deleteability_map(ctx.get("items"))
         return ctx
 
 
-class PrinterCreate(LoginRequiredMixin, CreateView):
+class PrinterCreate(LoginRequiredMixin, QueryParamMixin, CreateView):
     model = Printer
     form_class = PrinterForm
     template_name = "inventory/crud/printer_form.html"
@@ -707,7 +725,7 @@ class PrinterCreate(LoginRequiredMixin, CreateView):
 
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
-        building_id = (self.request.GET.get("building") or "").strip()
+        building_id = self.building_id
         kwargs["building_id"] = building_id or None
         return kwargs
 
@@ -715,12 +733,12 @@ class PrinterCreate(LoginRequiredMixin, CreateView):
         ctx = super().get_context_data(**kwargs)
         ctx["title"] = "Добавить принтер"
 
-        building_id = (self.request.GET.get("building") or "").strip()
+        building_id = self.building_id
         ctx["selected_building_id"] = building_id
         return ctx
 
 
-class PrinterUpdate(LoginRequiredMixin, UpdateView):
+class PrinterUpdate(LoginRequiredMixin, QueryParamMixin, UpdateView):
     model = Printer
     form_class = PrinterForm
     template_name = "inventory/crud/printer_form.html"
@@ -728,7 +746,7 @@ class PrinterUpdate(LoginRequiredMixin, UpdateView):
 
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
-        building_id = (self.request.GET.get("building") or "").strip()
+        building_id = self.building_id
         # Если в URL не передали building — оставляем None, форма сама подставит initial из instance.room.building
         kwargs["building_id"] = building_id or None
         return kwargs
@@ -737,7 +755,7 @@ class PrinterUpdate(LoginRequiredMixin, UpdateView):
         ctx = super().get_context_data(**kwargs)
         ctx["title"] = "Редактировать принтер"
 
-        building_id = (self.request.GET.get("building") or "").strip()
+        building_id = self.building_id
         ctx["selected_building_id"] = building_id
         return ctx
 
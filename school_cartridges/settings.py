@@ -73,6 +73,10 @@ DATABASES = {
         "PASSWORD": os.getenv("POSTGRES_PASSWORD", "school_cartridges"),
         "HOST": os.getenv("POSTGRES_HOST", "db"),
         "PORT": os.getenv("POSTGRES_PORT", "5432"),
+        # gunicorn с sync-воркерами: соединение держим между запросами, а не открываем на каждый;
+        # перед повторным использованием Django проверяет, что оно живо
+        "CONN_MAX_AGE": int(os.getenv("POSTGRES_CONN_MAX_AGE", "60")),
+        "CONN_HEALTH_CHECKS": True,
     }
 }
 
@@ -95,7 +99,15 @@ STATICFILES_DIRS = [
     BASE_DIR / "school_cartridges" / "static",
 ]
 
-STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
+# STATICFILES_STORAGE в Django 5.1+ больше не читается – хранилища задаются через STORAGES.
+# Сжатые копии (.gz, а при установленном brotli и .br) WhiteNoise готовит на collectstatic,
+# хэшированные имена из манифеста отдаёт с Cache-Control: immutable.
+# Без манифеста {% static %} падает при DEBUG=0: тестам, рендерящим шаблоны,
+# нужен @override_settings(STORAGES=...) с обычным StaticFilesStorage
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage"},
+}
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 